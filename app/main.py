@@ -1,23 +1,53 @@
 """
 Machine Translation API with:
 - Priority queue (P0–P3, 0 = highest priority)
-- Background worker
+- Background worker with dynamic micro-batching
+- Adaptive batch-size controller
+- CTranslate2 (default) or HuggingFace inference backend
+- LRU cache of recent translations
 - Prometheus metrics
 
 File: app/main.py
 """
 
 import asyncio
+import concurrent.futures
+import hashlib
+import logging
+import os
+import queue
+import sys
 import time
-from typing import Optional
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener
+from typing import List, Optional, Tuple
 
 import torch
+from cachetools import LRUCache
 from fastapi import FastAPI, HTTPException
 from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
-from transformers import MarianMTModel, MarianTokenizer
+from transformers import AutoTokenizer, MarianMTModel, PreTrainedTokenizerBase
 
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+
+# -------------------------------------------------------------------
+# Logging
+# -------------------------------------------------------------------
+
+# Records are formatted on the calling thread (QueueHandler.prepare) and the
+# stream writes happen on a background thread, so a slow stdout (e.g. a
+# blocked Docker log pipe) never stalls the event loop
+logger = logging.getLogger("mt")
+logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+logger.propagate = False
+
+_log_queue: "queue.SimpleQueue" = queue.SimpleQueue()
+logger.addHandler(QueueHandler(_log_queue))
+
+_log_stream_handler = logging.StreamHandler(sys.stdout)
+_log_stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+log_listener = QueueListener(_log_queue, _log_stream_handler)
 
 # -------------------------------------------------------------------
 # FastAPI app
@@ -30,12 +60,71 @@ app = FastAPI(title="MT System with Priority Queue & Metrics")
 # -------------------------------------------------------------------
 
 MODEL_PATH = "./models/opus-mt-en-fr"
+CT2_MODEL_PATH = "./models/opus-mt-en-fr-ct2"
+
+# "ct2" = CTranslate2 int8 translator (see models/download_model.py),
+# "hf"  = eager PyTorch MarianMTModel
+BACKEND = os.getenv("MT_BACKEND", "ct2").lower()
+
+# Deployments that only have the HF checkpoint keep working on the HF backend
+if BACKEND == "ct2" and not os.path.isdir(CT2_MODEL_PATH):
+    logger.warning(
+        f"⚠ CTranslate2 model not found at {CT2_MODEL_PATH} "
+        f"(run models/download_model.py), falling back to MT_BACKEND=hf"
+    )
+    BACKEND = "hf"
 
+# Numeric format for the HF backend: "auto" (fp16 on CUDA, int8 on CPU),
+# "fp32", "fp16", "bf16" or "int8" (dynamic quantization, CPU only)
+COMPUTE_DTYPE = os.getenv("COMPUTE_DTYPE", "auto").lower()
 
+# Attention kernel for the HF backend ("sdpa" = fused scaled_dot_product_attention,
+# "eager" = reference implementation; empty = transformers' own default)
+ATTN_IMPLEMENTATION = os.getenv("MT_ATTN_IMPLEMENTATION", "sdpa")
+
+# Wrap the HF model's forward pass in torch.compile ("1" to enable). Off by
+# default: generate() grows the KV cache every step, which can trigger
+# recompiles / CUDA graph re-recording on each decode step.
+TORCH_COMPILE = os.getenv("MT_TORCH_COMPILE", "0") == "1"
+TORCH_COMPILE_MODE = os.getenv("MT_TORCH_COMPILE_MODE", "reduce-overhead")
+
+# Smaller MarianMT checkpoint used as a draft model for assisted (speculative)
+# decoding on the HF backend; must share the main model's tokenizer/vocab.
+# Unset = disabled, since it costs extra memory for lower single-request latency.
+ASSISTANT_MODEL_PATH = os.getenv("MT_ASSISTANT_MODEL_PATH", "")
+
+# Run representative batches at startup before reporting ready ("0" to skip)
+WARMUP = os.getenv("MT_WARMUP", "1") == "1"
 
 model: Optional[MarianMTModel] = None
-tokenizer: Optional[MarianTokenizer] = None
+assistant_model: Optional[MarianMTModel] = None
+translator = None  # ctranslate2.Translator when BACKEND == "ct2"
+tokenizer: Optional[PreTrainedTokenizerBase] = None
 device = "cpu"
+service_ready = False  # set once warm-up has finished
+
+
+def model_ready() -> bool:
+    if tokenizer is None:
+        return False
+    return translator is not None if BACKEND == "ct2" else model is not None
+
+
+# -------------------------------------------------------------------
+# Translation cache
+# -------------------------------------------------------------------
+
+# Translation is a pure function of the input for a fixed model, so repeated
+# texts are answered without touching the queue ("0" disables)
+CACHE_SIZE = int(os.getenv("MT_CACHE_SIZE", "10000"))
+translation_cache: Optional[LRUCache] = LRUCache(maxsize=CACHE_SIZE) if CACHE_SIZE > 0 else None
+
+
+def cache_key(text: str) -> bytes:
+    # Whitespace is normalized but case is kept: it changes the translation
+    normalized = " ".join(text.split())
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).digest()
+
 
 # -------------------------------------------------------------------
 # Priority queue & worker
@@ -45,9 +134,196 @@ device = "cpu"
 MIN_PRIORITY = 0
 MAX_PRIORITY = 3
 
-# Async priority queue: lower number -> higher priority
-task_queue: "asyncio.PriorityQueue" = asyncio.PriorityQueue()
-worker_task: Optional[asyncio.Task] = None
+# Jobs waiting longer than this are promoted one priority level per interval
+# (unset = strict priority, low-priority work may starve under sustained load)
+PRIORITY_AGING_SECONDS = float(os.getenv("MT_PRIORITY_AGING_SECONDS", "0")) or None
+
+
+class JobBatch:
+    """
+    Struct-of-arrays view of dequeued jobs.
+
+    `priorities`, `created_at`, `texts` and `futures` are parallel lists; no
+    per-job tuple is allocated or unpacked on the hot path.
+    """
+
+    __slots__ = ("priorities", "created_at", "texts", "futures")
+
+    def __init__(self):
+        self.priorities: List[int] = []
+        self.created_at: List[float] = []
+        self.texts: List[str] = []
+        self.futures: List[asyncio.Future] = []
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def take(self, indices: List[int]) -> "JobBatch":
+        subset = JobBatch()
+        subset.priorities = [self.priorities[i] for i in indices]
+        subset.created_at = [self.created_at[i] for i in indices]
+        subset.texts = [self.texts[i] for i in indices]
+        subset.futures = [self.futures[i] for i in indices]
+        return subset
+
+
+class _Bucket:
+    """One priority level: FIFO deques of job fields kept in lockstep."""
+
+    __slots__ = ("priorities", "created_at", "texts", "futures")
+
+    def __init__(self):
+        self.priorities = deque()
+        self.created_at = deque()
+        self.texts = deque()
+        self.futures = deque()
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def append(self, priority: int, created_at: float, text: str, future: asyncio.Future):
+        self.priorities.append(priority)
+        self.created_at.append(created_at)
+        self.texts.append(text)
+        self.futures.append(future)
+
+    def popleft(self) -> Tuple[int, float, str, asyncio.Future]:
+        return (
+            self.priorities.popleft(),
+            self.created_at.popleft(),
+            self.texts.popleft(),
+            self.futures.popleft(),
+        )
+
+    def pop_into(self, batch: JobBatch, n: int):
+        for _ in range(min(n, len(self))):
+            batch.priorities.append(self.priorities.popleft())
+            batch.created_at.append(self.created_at.popleft())
+            batch.texts.append(self.texts.popleft())
+            batch.futures.append(self.futures.popleft())
+
+
+class BucketedPQ:
+    """
+    Async priority queue with one FIFO bucket per priority level.
+
+    With only MIN_PRIORITY..MAX_PRIORITY levels, put/get are O(1) and jobs
+    are never compared with each other (unlike a heap of tuples). `get`
+    returns `(bucket, JobBatch)` so callers know which level the jobs
+    (possibly aged) were served from.
+    """
+
+    def __init__(
+        self,
+        levels: int,
+        aging_seconds: Optional[float] = None,
+        capacities: Optional[List[Optional[int]]] = None,
+    ):
+        self._buckets = [_Bucket() for _ in range(levels)]
+        self._nonempty = asyncio.Event()
+        self._aging_seconds = aging_seconds
+        self._capacities = capacities or [None] * levels
+
+    def qsize(self) -> int:
+        return sum(len(b) for b in self._buckets)
+
+    def depth(self, priority: int) -> int:
+        return len(self._buckets[priority])
+
+    def full(self, priority: int) -> bool:
+        cap = self._capacities[priority]
+        return cap is not None and len(self._buckets[priority]) >= cap
+
+    def put_nowait(self, priority: int, created_at: float, text: str, future: asyncio.Future):
+        self._buckets[priority].append(priority, created_at, text, future)
+        self._nonempty.set()
+
+    def _age(self):
+        """Promote bucket heads that have waited past the aging interval."""
+        now = time.monotonic()
+        for p in range(1, len(self._buckets)):
+            bucket = self._buckets[p]
+            while bucket:
+                waited = now - bucket.created_at[0]
+                target = max(0, bucket.priorities[0] - int(waited // self._aging_seconds))
+                if target >= p:
+                    break
+                self._buckets[target].append(*bucket.popleft())
+
+    def get_nowait(self, max_priority: int = MAX_PRIORITY, n: int = 1) -> Tuple[int, JobBatch]:
+        """
+        Pop up to `n` of the oldest jobs from the highest non-empty bucket
+        <= max_priority. Jobs from lower-priority buckets are never mixed in.
+        """
+        if self._aging_seconds:
+            self._age()
+        for p in range(max_priority + 1):
+            if self._buckets[p]:
+                batch = JobBatch()
+                self._buckets[p].pop_into(batch, n)
+                return p, batch
+        raise asyncio.QueueEmpty
+
+    async def get(self, max_priority: int = MAX_PRIORITY, n: int = 1) -> Tuple[int, JobBatch]:
+        while True:
+            try:
+                return self.get_nowait(max_priority, n)
+            except asyncio.QueueEmpty:
+                self._nonempty.clear()
+                await self._nonempty.wait()
+
+
+# Max queued jobs per priority level, P0..P3 ("0" = unbounded). Lower
+# priorities are shed first with 429 so overload can't grow the queue without bound.
+def parse_queue_capacities(raw: str) -> List[Optional[int]]:
+    caps = [int(c) for c in raw.split(",")]
+    if len(caps) != MAX_PRIORITY + 1 or any(c < 0 for c in caps):
+        raise ValueError(
+            f"MT_QUEUE_CAPACITIES must list {MAX_PRIORITY + 1} non-negative "
+            f"integers (P{MIN_PRIORITY}..P{MAX_PRIORITY}), got {raw!r}"
+        )
+    return [c or None for c in caps]
+
+
+QUEUE_CAPACITIES = parse_queue_capacities(os.getenv("MT_QUEUE_CAPACITIES", "0,1000,500,100"))
+
+# Lower number -> higher priority
+task_queue = BucketedPQ(
+    MAX_PRIORITY + 1, aging_seconds=PRIORITY_AGING_SECONDS, capacities=QUEUE_CAPACITIES
+)
+worker_tasks: List[asyncio.Task] = []
+warmup_task: Optional[asyncio.Task] = None
+
+# Number of worker loops consuming the shared queue. CPU deployments can run
+# several against the same (read-only) model; CUDA always uses one.
+WORKERS = max(1, int(os.getenv("MT_WORKERS", "1")))
+
+# Model calls run here so they don't block the event loop; one thread per
+# worker, so inference stays serialized on a single GPU
+executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+# Upper bound on the number of queued jobs coalesced into a single model.generate call
+MAX_BATCH = int(os.getenv("MT_MAX_BATCH", "16"))
+
+# How long the worker waits for more jobs to arrive before running a partial batch
+BATCH_WAIT_MS = float(os.getenv("MT_BATCH_WAIT_MS", "10"))
+
+# Batch sizes the adaptive controller chooses between
+BATCH_SIZE_CANDIDATES = [b for b in (1, 2, 4, 8, 16) if b <= MAX_BATCH] or [1]
+
+# Batches slower than this are never targeted again (bounds tail latency)
+BATCH_LATENCY_BUDGET = float(os.getenv("MT_BATCH_LATENCY_BUDGET_MS", "1000")) / 1000
+
+# Rough device memory needed per batch item, used to cap batch size on CUDA
+CUDA_BYTES_PER_ITEM = int(os.getenv("MT_CUDA_MB_PER_ITEM", "64")) * 1024 * 1024
+
+# Upper bound on generated tokens; each batch gets a smaller budget derived
+# from its longest input so decoding doesn't run (and allocate) to 512
+MAX_NEW_TOKENS = int(os.getenv("MT_MAX_NEW_TOKENS", "512"))
+
+# Padded sequence lengths; every model call uses one of these shapes so
+# torch.compile / cuDNN caches see a bounded set of inputs
+LENGTH_BUCKETS = (16, 32, 64, 128, 256, 512)
 
 
 class TranslateRequest(BaseModel):
@@ -65,7 +341,8 @@ class TranslateResponse(BaseModel):
 
 
 # Each queue item: (priority, created_time, text, future)
-# created_time ensures FIFO within same priority level.
+# created_time comes from time.monotonic(), which never jumps with NTP.
+# priority is the level requested by the client; aging may serve it earlier.
 
 
 # -------------------------------------------------------------------
@@ -90,83 +367,445 @@ QUEUE_TIME_HISTOGRAM = Histogram(
     ["priority"],
 )
 
-IN_PROGRESS = Counter(
+CACHE_HITS = Counter(
+    "mt_cache_hits_total",
+    "Translation requests answered from the result cache",
+)
+
+IN_PROGRESS = Gauge(
     "mt_requests_in_progress",
     "Requests currently being processed",
     ["priority"],
 )
 
+QUEUE_DEPTH = Gauge(
+    "mt_queue_depth",
+    "Jobs currently waiting in the queue",
+    ["priority"],
+)
+
+# Label children resolved once per priority so the hot path is a list index
+PRIORITIES = range(MIN_PRIORITY, MAX_PRIORITY + 1)
+REQUEST_COUNTER_BY_PRIO = [REQUEST_COUNTER.labels(priority=str(p)) for p in PRIORITIES]
+LATENCY_HISTOGRAM_BY_PRIO = [LATENCY_HISTOGRAM.labels(priority=str(p)) for p in PRIORITIES]
+QUEUE_TIME_HISTOGRAM_BY_PRIO = [QUEUE_TIME_HISTOGRAM.labels(priority=str(p)) for p in PRIORITIES]
+IN_PROGRESS_BY_PRIO = [IN_PROGRESS.labels(priority=str(p)) for p in PRIORITIES]
+
+# Queue depth is read at scrape time, so the hot path pays nothing for it
+for _p in PRIORITIES:
+    QUEUE_DEPTH.labels(priority=str(_p)).set_function(lambda p=_p: task_queue.depth(p))
+
+BATCH_SIZE_GAUGE = Gauge(
+    "mt_batch_size",
+    "Target batch size currently chosen by the adaptive controller",
+)
+
+# /metrics output is reused for this many seconds so frequent or concurrent
+# scrapes don't re-serialize every metric family
+METRICS_CACHE_TTL = float(os.getenv("MT_METRICS_CACHE_TTL", "1.0"))
+_metrics_cache = {"ts": float("-inf"), "data": ""}
+_metrics_lock = asyncio.Lock()
+
+
+# -------------------------------------------------------------------
+# Adaptive batch-size controller
+# -------------------------------------------------------------------
+
+class BatchSizeController:
+    """
+    Picks the target batch size with the lowest observed cost per job.
+
+    For every candidate target B it keeps an EWMA of the time from the first
+    job's dequeue to the end of processing (coalescing wait included) and of
+    that time divided by the jobs actually served. It targets the B with the
+    lowest per-job cost, so under light load, where larger targets only add
+    wait, it settles on small sizes. Each target is tried once up front, and
+    every `explore_every` batches a neighbouring size is retried so the
+    estimate follows changes in load and input length.
+    """
+
+    def __init__(self, candidates: List[int], alpha: float = 0.2, explore_every: int = 50):
+        self.candidates = candidates
+        self.alpha = alpha
+        self.explore_every = explore_every
+        self.batch_time = {}  # target B -> EWMA of seconds per batch
+        self.item_time = {}  # target B -> EWMA of seconds per job served
+        self.batches_seen = 0
+
+    def _device_cap(self) -> int:
+        if device != "cuda":
+            return self.candidates[-1]
+        free_bytes, _ = torch.cuda.mem_get_info()
+        # Blocks cached by PyTorch's allocator are reusable by this process
+        free_bytes += torch.cuda.memory_reserved() - torch.cuda.memory_allocated()
+        return max(1, free_bytes // CUDA_BYTES_PER_ITEM)
+
+    def choose(self) -> int:
+        cap = self._device_cap()
+        allowed = [b for b in self.candidates if b <= cap] or [1]
+
+        untried = [b for b in allowed if b not in self.item_time]
+        if untried:
+            return untried[0]
+
+        within_budget = [
+            b for b in allowed if b == 1 or self.batch_time[b] <= BATCH_LATENCY_BUDGET
+        ]
+        best = min(within_budget, key=lambda b: self.item_time[b])
+
+        if self.batches_seen % self.explore_every == 0:
+            idx = within_budget.index(best)
+            if idx + 1 < len(within_budget):
+                return within_budget[idx + 1]
+        return best
+
+    def _update(self, ewma: dict, key: int, value: float):
+        prev = ewma.get(key)
+        ewma[key] = value if prev is None else (1 - self.alpha) * prev + self.alpha * value
+
+    def record(self, target_size: int, served: int, elapsed: float):
+        """Attribute a finished drain to the target size it was collected for."""
+        self.batches_seen += 1
+        self._update(self.batch_time, target_size, elapsed)
+        self._update(self.item_time, target_size, elapsed / served)
+
+
+batch_controller = BatchSizeController(BATCH_SIZE_CANDIDATES)
+
 
 # -------------------------------------------------------------------
 # Helper: translation function
 # -------------------------------------------------------------------
 
-def translate_text(text: str) -> str:
-    if model is None or tokenizer is None:
+def resolve_compute_dtype() -> str:
+    if COMPUTE_DTYPE == "auto":
+        return "fp16" if device == "cuda" else "int8"
+    return COMPUTE_DTYPE
+
+
+def load_torch_dtype() -> torch.dtype:
+    """Dtype to load weights in, so fp16/bf16 models are never materialized as fp32."""
+    return {"fp16": torch.float16, "bf16": torch.bfloat16}.get(
+        resolve_compute_dtype(), torch.float32
+    )
+
+
+def apply_compute_dtype(hf_model: MarianMTModel) -> MarianMTModel:
+    """Cast or quantize the loaded model according to COMPUTE_DTYPE."""
+    dtype = resolve_compute_dtype()
+
+    if dtype == "fp16":
+        return hf_model.half()
+    if dtype == "bf16":
+        return hf_model.to(torch.bfloat16)
+    if dtype == "int8":
+        if device == "cuda":
+            raise ValueError("COMPUTE_DTYPE=int8 is only supported on CPU")
+        return torch.quantization.quantize_dynamic(
+            hf_model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+    if dtype == "fp32":
+        return hf_model
+    raise ValueError(f"Unknown COMPUTE_DTYPE: {COMPUTE_DTYPE}")
+
+
+def length_bucket(num_tokens: float) -> int:
+    """Smallest padded length in LENGTH_BUCKETS that fits `num_tokens`."""
+    for bucket in LENGTH_BUCKETS:
+        if num_tokens <= bucket:
+            return bucket
+    return LENGTH_BUCKETS[-1]
+
+
+def group_by_length(texts: List[str]) -> List[List[int]]:
+    """
+    Group text indices by estimated token-length bucket.
+
+    Uses ~1.3 tokens per whitespace word as a cheap estimate so short inputs
+    are not padded out to the longest text in the batch.
+    """
+    groups = {}
+    for i, text in enumerate(texts):
+        bucket = length_bucket(len(text.split()) * 1.3)
+        groups.setdefault(bucket, []).append(i)
+    return [groups[b] for b in sorted(groups)]
+
+
+def max_new_tokens_for(input_ids: List[List[int]]) -> int:
+    """Decode budget for a batch: 2 target tokens per source token, plus slack."""
+    longest_tokens = max(len(ids) for ids in input_ids)
+    return min(longest_tokens * 2 + 16, MAX_NEW_TOKENS)
+
+
+def translate_texts(texts: List[str]) -> List[str]:
+    """
+    Translate a batch of texts with a single padded forward pass.
+
+    The HF backend pads to the smallest LENGTH_BUCKETS entry that fits the
+    longest text, never truncating below what the model would accept.
+    """
+    if not model_ready():
         raise RuntimeError("Model not loaded")
 
-    inputs = tokenizer([text], return_tensors="pt", padding=True, truncation=True)
-    inputs = {k: v.to(device) for k, v in inputs.items()}
+    if BACKEND == "ct2":
+        return _translate_texts_ct2(texts)
+
+    encoded = tokenizer(texts, truncation=True, max_length=LENGTH_BUCKETS[-1])
+    longest = max(len(ids) for ids in encoded["input_ids"])
+    inputs = tokenizer.pad(
+        encoded,
+        padding="max_length",
+        max_length=length_bucket(longest),
+        return_tensors="pt",
+    )
+
+    # The checkpoint's generation config runs beam search (num_beams from
+    # Marian's decoder.yml); stop as soon as every beam has finished
+    gen_kwargs = {
+        "max_new_tokens": max_new_tokens_for(encoded["input_ids"]),
+        "early_stopping": True,
+    }
+    # Assisted generation only supports greedy/sampling, so with a draft model
+    # configured every batch decodes greedily (trading the checkpoint's beam
+    # search for latency) and output doesn't depend on how a request was
+    # batched. transformers only accepts the draft itself for batch size 1.
+    if assistant_model is not None:
+        gen_kwargs["num_beams"] = 1
+        del gen_kwargs["early_stopping"]  # beam-search only
+        if len(texts) == 1:
+            gen_kwargs["assistant_model"] = assistant_model
+
+    if device == "cuda":
+        # Pinned host buffers make the H2D copies async and cheaper
+        for k, v in inputs.items():
+            inputs[k] = v.pin_memory()
+        inputs = inputs.to(device, non_blocking=True)
+    else:
+        inputs = inputs.to(device)
 
     with torch.no_grad():
-        output_tokens = model.generate(**inputs, max_length=512)
+        output_tokens = model.generate(**inputs, **gen_kwargs)
+
+    return tokenizer.batch_decode(output_tokens, skip_special_tokens=True)
+
+
+def _translate_texts_ct2(texts: List[str]) -> List[str]:
+    encoded = tokenizer(texts, truncation=True, max_length=LENGTH_BUCKETS[-1])
+    source = [tokenizer.convert_ids_to_tokens(ids) for ids in encoded["input_ids"]]
+    results = translator.translate_batch(
+        source, max_decoding_length=max_new_tokens_for(encoded["input_ids"])
+    )
+    return tokenizer.batch_decode(
+        [tokenizer.convert_tokens_to_ids(r.hypotheses[0]) for r in results],
+        skip_special_tokens=True,
+    )
+
+
+def translate_text(text: str) -> str:
+    return translate_texts([text])[0]
+
+
+async def warm_up():
+    """
+    Run warm-up batches before reporting ready on /ready.
+
+    With torch.compile on (HF backend), runs each length bucket at each
+    candidate batch size so the common padded shapes are compiled before real
+    traffic. Length grouping can still produce other sub-batch sizes, which
+    compile on first use. Otherwise a single short batch is enough to touch
+    the weights and initialize the runtime.
+    """
+    global service_ready
+
+    if WARMUP and model_ready():
+        loop = asyncio.get_running_loop()
+        start = time.monotonic()
+        if BACKEND == "hf" and TORCH_COMPILE:
+            shapes = [(b, n) for b in LENGTH_BUCKETS for n in BATCH_SIZE_CANDIDATES]
+        else:
+            shapes = [(LENGTH_BUCKETS[0], 1)]
+        try:
+            for bucket, batch_size in shapes:
+                texts = ["hello " * (bucket // 2)] * batch_size
+                await loop.run_in_executor(executor, translate_texts, texts)
+            logger.info(
+                f"   ✓ Warm-up complete ({len(shapes)} shape(s), "
+                f"{time.monotonic() - start:.1f}s)"
+            )
+        except Exception as e:
+            logger.warning(f"   ⚠ Warm-up failed: {e}")
+
+    service_ready = model_ready()
+
+
+def compile_model():
+    """
+    Compile the HF model's forward pass and pay the compile cost up front.
+
+    generate() calls self.forward, so the compiled function is installed on
+    the module itself rather than wrapping it in an OptimizedModule. The
+    first call traces and compiles, the second runs the compiled graph.
+    """
+    eager_forward = model.forward
+    model.forward = torch.compile(eager_forward, mode=TORCH_COMPILE_MODE, fullgraph=False)
+    try:
+        for _ in range(2):
+            translate_text("hello")
+        logger.info(f"   ✓ Model compiled (mode={TORCH_COMPILE_MODE})")
+    except Exception as e:
+        logger.warning(f"   ⚠ torch.compile failed, using eager forward: {e}")
+        model.forward = eager_forward
 
-    translated = tokenizer.batch_decode(output_tokens, skip_special_tokens=True)[0]
-    return translated
+
+def load_assistant_model() -> Optional[MarianMTModel]:
+    """
+    Load the optional draft model; the service runs without it on failure.
+
+    The draft must share the main model's vocabulary and special tokens,
+    otherwise its proposed token ids are meaningless to the main model.
+    """
+    try:
+        draft = MarianMTModel.from_pretrained(
+            ASSISTANT_MODEL_PATH,
+            torch_dtype=load_torch_dtype(),
+            low_cpu_mem_usage=True,
+            device_map={"": device},
+        )
+        for attr in ("vocab_size", "decoder_start_token_id", "pad_token_id"):
+            if getattr(draft.config, attr) != getattr(model.config, attr):
+                logger.warning(
+                    f"   ⚠ Assistant model {attr}={getattr(draft.config, attr)} does not "
+                    f"match main model ({getattr(model.config, attr)}), decoding without it"
+                )
+                return None
+        draft = apply_compute_dtype(draft)
+        logger.info(f"   ✓ Assistant model loaded from: {ASSISTANT_MODEL_PATH}")
+        return draft
+    except Exception as e:
+        logger.warning(f"   ⚠ Failed to load assistant model, decoding without it: {e}")
+        return None
 
 
 # -------------------------------------------------------------------
 # Background worker that consumes the priority queue
 # -------------------------------------------------------------------
 
-async def worker_loop():
-    print("=" * 60)
-    print("🧵 Starting background worker for translation queue")
-    print("=" * 60)
+async def drain_batch(batch: JobBatch, bucket: int, target_size: int) -> JobBatch:
+    """
+    Grow `batch` to up to `target_size` jobs from `bucket` or higher-priority buckets.
 
-    while True:
+    Waits at most BATCH_WAIT_MS for more jobs so batches can form under bursty
+    load. Lower-priority jobs are never pulled in, so they can't ride along
+    with (and slow down) higher-priority work.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + BATCH_WAIT_MS / 1000
+
+    while len(batch) < target_size:
+        missing = target_size - len(batch)
         try:
-            # Wait for next job from queue
-            priority, created_at, text, future = await task_queue.get()
-            priority_label = str(priority)
+            _, more = task_queue.get_nowait(max_priority=bucket, n=missing)
+        except asyncio.QueueEmpty:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                _, more = await asyncio.wait_for(
+                    task_queue.get(max_priority=bucket, n=missing), timeout=remaining
+                )
+            except asyncio.TimeoutError:
+                break
+        batch.priorities.extend(more.priorities)
+        batch.created_at.extend(more.created_at)
+        batch.texts.extend(more.texts)
+        batch.futures.extend(more.futures)
 
-            start_proc = time.time()
-            queue_time = start_proc - created_at
+    return batch
 
-            print(
-                f"[WORKER] Dequeued job | priority={priority} | "
-                f"queued_for={queue_time:.3f}s | text='{text[:40]}...'"
-            )
 
-            QUEUE_TIME_HISTOGRAM.labels(priority=priority_label).observe(queue_time)
-            IN_PROGRESS.labels(priority=priority_label).inc()
+async def run_batch(batch: JobBatch, queue_times: List[float]):
+    """Translate one length-homogeneous batch and resolve its futures."""
+    loop = asyncio.get_running_loop()
+    start_proc = time.monotonic()
+    try:
+        translations = await loop.run_in_executor(executor, translate_texts, batch.texts)
+        proc_time = time.monotonic() - start_proc
+        for priority, text, future, translated, queue_time in zip(
+            batch.priorities, batch.texts, batch.futures, translations, queue_times
+        ):
+            if translation_cache is not None:
+                translation_cache[cache_key(text)] = translated
+            result = {
+                "original_text": text,
+                "translated_text": translated,
+                "priority": priority,
+                "processing_time": proc_time,
+                "queued_time": queue_time,
+                "model_loaded": True,
+            }
+            # Send result back to the waiting request handler
+            if not future.cancelled():
+                future.set_result(result)
+    except Exception as e:
+        for future in batch.futures:
+            if not future.cancelled():
+                future.set_exception(e)
+
+
+async def worker_loop(worker_id: int = 0):
+    logger.info("=" * 60)
+    logger.info(f"🧵 Starting background worker {worker_id} for translation queue")
+    logger.info("=" * 60)
+
+    while True:
+        try:
+            # Wait for next job(s) from queue, then coalesce whatever else is pending
+            target_size = batch_controller.choose()
+            BATCH_SIZE_GAUGE.set(target_size)
+            bucket, batch = await task_queue.get(n=target_size)
+            start_batch = time.monotonic()
+            if target_size > 1:
+                batch = await drain_batch(batch, bucket, target_size)
+
+            now = time.monotonic()
+            queue_times = [now - created_at for created_at in batch.created_at]
+
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    f"[WORKER {worker_id}] Dequeued batch | bucket={bucket} | size={len(batch)} | "
+                    f"max_queued_for={max(queue_times):.3f}s"
+                )
+
+            for priority in batch.priorities:
+                IN_PROGRESS_BY_PRIO[priority].inc()
+
+            # Only the HF backend benefits from length-homogeneous batches (bounded
+            # padded shapes for torch.compile); CTranslate2 sorts by length itself
+            if BACKEND == "hf":
+                groups = group_by_length(batch.texts)
+            else:
+                groups = [list(range(len(batch)))]
 
             try:
-                translated = translate_text(text)
-                proc_time = time.time() - start_proc
-                result = {
-                    "original_text": text,
-                    "translated_text": translated,
-                    "priority": priority,
-                    "processing_time": proc_time,
-                    "queued_time": queue_time,
-                    "model_loaded": True,
-                }
-                # Send result back to the waiting request handler
-                if not future.cancelled():
-                    future.set_result(result)
-            except Exception as e:
-                if not future.cancelled():
-                    future.set_exception(e)
+                for group in groups:
+                    await run_batch(batch.take(group), [queue_times[i] for i in group])
+                # The controller picks drain sizes, so it learns from whole drains,
+                # including the time spent waiting for the batch to fill
+                batch_controller.record(
+                    target_size, len(batch), time.monotonic() - start_batch
+                )
             finally:
-                IN_PROGRESS.labels(priority=priority_label).dec()
-                task_queue.task_done()
+                # Observe the whole batch in one pass once the model is done,
+                # keeping metric locks off the path to the first model call
+                for priority, queue_time in zip(batch.priorities, queue_times):
+                    QUEUE_TIME_HISTOGRAM_BY_PRIO[priority].observe(queue_time)
+                    IN_PROGRESS_BY_PRIO[priority].dec()
 
         except asyncio.CancelledError:
-            print("[WORKER] Cancellation received, shutting down worker loop")
+            logger.info(f"[WORKER {worker_id}] Cancellation received, shutting down worker loop")
             break
         except Exception as e:
-            print(f"[WORKER] Error in worker loop: {e}")
+            logger.exception(f"[WORKER {worker_id}] Error in worker loop: {e}")
 
 
 # -------------------------------------------------------------------
@@ -175,45 +814,106 @@ async def worker_loop():
 
 @app.on_event("startup")
 async def startup_event():
-    global model, tokenizer, device, worker_task
+    global model, assistant_model, translator, tokenizer, device
+    global worker_tasks, executor, warmup_task
 
-    print("=" * 60)
-    print("🚀 Starting Translation Service with Priority Queue")
-    print("=" * 60)
-    print(f"📂 Loading model from: {MODEL_PATH}")
+    log_listener.start()
 
-    try:
-        tokenizer = MarianTokenizer.from_pretrained(MODEL_PATH)
-        print("   ✓ Tokenizer loaded")
-        model = MarianMTModel.from_pretrained(MODEL_PATH)
-        print("   ✓ Model loaded")
+    logger.info("=" * 60)
+    logger.info("🚀 Starting Translation Service with Priority Queue")
+    logger.info("=" * 60)
+    logger.info(f"📂 Loading model from: {MODEL_PATH} (backend={BACKEND})")
 
+    try:
         device = "cuda" if torch.cuda.is_available() else "cpu"
-        print(f"   Moving model to: {device}")
-        model.to(device)
-        print("   ✓ Model ready")
+        workers = 1 if device == "cuda" else WORKERS
+        # Split cores between workers to avoid thread oversubscription
+        threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+        if device == "cpu":
+            torch.set_num_threads(threads_per_worker)
+
+        tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH, use_fast=True)
+        logger.info(f"   ✓ Tokenizer loaded (fast={tokenizer.is_fast})")
+
+        if BACKEND == "ct2":
+            import ctranslate2
+
+            compute_type = "int8_float16" if device == "cuda" else "int8"
+            logger.info(f"   Loading CTranslate2 model from: {CT2_MODEL_PATH} ({compute_type})")
+            translator = ctranslate2.Translator(
+                CT2_MODEL_PATH,
+                device=device,
+                compute_type=compute_type,
+                inter_threads=workers,
+                intra_threads=threads_per_worker if device == "cpu" else 0,
+            )
+            logger.info(f"   ✓ Translator ready on: {device}")
+            if ASSISTANT_MODEL_PATH:
+                logger.warning("   ⚠ MT_ASSISTANT_MODEL_PATH is ignored by the ct2 backend")
+        else:
+            # Load straight onto the target device in the target dtype
+            # (memory-mapped safetensors, no intermediate fp32 CPU copy)
+            load_kwargs = {}
+            if ATTN_IMPLEMENTATION:
+                load_kwargs["attn_implementation"] = ATTN_IMPLEMENTATION
+            model = MarianMTModel.from_pretrained(
+                MODEL_PATH,
+                torch_dtype=load_torch_dtype(),
+                low_cpu_mem_usage=True,
+                device_map={"": device},
+                **load_kwargs,
+            )
+            logger.info(
+                f"   ✓ Model loaded on {device} (attention={ATTN_IMPLEMENTATION or 'default'})"
+            )
+
+            model = apply_compute_dtype(model)
+            model.generation_config.use_cache = True
+            logger.info(f"   ✓ Model ready (dtype={next(model.parameters()).dtype})")
+
+            if ASSISTANT_MODEL_PATH:
+                assistant_model = load_assistant_model()
+
+            if TORCH_COMPILE:
+                compile_model()
     except Exception as e:
-        print(f"❌ Failed to load model: {e}")
+        workers = 1
+        logger.error(f"❌ Failed to load model: {e}")
         model = None
+        assistant_model = None
+        translator = None
         tokenizer = None
 
-    # Start background worker
-    worker_task = asyncio.create_task(worker_loop())
-    print("   ✓ Worker started")
-    print("=" * 60)
+    # Start background workers
+    executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="mt-inference"
+    )
+    worker_tasks = [asyncio.create_task(worker_loop(i)) for i in range(workers)]
+    logger.info(f"   ✓ {workers} worker(s) started")
+
+    # Warm up in the background so /health answers while shapes compile
+    warmup_task = asyncio.create_task(warm_up())
+    logger.info("=" * 60)
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    global worker_task
-    print("🛑 Shutting down translation service")
-    if worker_task:
-        worker_task.cancel()
+    global worker_tasks, executor, warmup_task
+    logger.info("🛑 Shutting down translation service")
+    tasks = worker_tasks + ([warmup_task] if warmup_task else [])
+    for task in tasks:
+        task.cancel()
+    for task in tasks:
         try:
-            await worker_task
+            await task
         except asyncio.CancelledError:
             pass
-    print("✓ Shutdown complete")
+    worker_tasks = []
+    warmup_task = None
+    if executor:
+        executor.shutdown(wait=True)
+    logger.info("✓ Shutdown complete")
+    log_listener.stop()  # flushes queued records
 
 
 # -------------------------------------------------------------------
@@ -224,15 +924,27 @@ async def shutdown_event():
 def health():
     return {
         "status": "healthy",
-        "model_loaded": model is not None,
+        "model_loaded": model_ready(),
+        "backend": BACKEND,
         "device": device,
         "queue_size": task_queue.qsize(),
+        "workers": len(worker_tasks),
+        "cache_size": len(translation_cache) if translation_cache is not None else 0,
     }
 
 
+@app.get("/ready")
+def ready():
+    """Readiness probe: 503 until the model is loaded and warmed up."""
+    if not service_ready:
+        detail = "Warming up" if model_ready() else "Model not loaded"
+        raise HTTPException(status_code=503, detail=detail)
+    return {"status": "ready"}
+
+
 @app.post("/translate", response_model=TranslateResponse)
 async def translate(req: TranslateRequest):
-    if model is None or tokenizer is None:
+    if not model_ready():
         raise HTTPException(status_code=500, detail="Model not loaded")
 
     # Validate priority
@@ -243,37 +955,59 @@ async def translate(req: TranslateRequest):
         )
 
     priority = req.priority
-    priority_label = str(priority)
 
-    start_total = time.time()
+    start_total = time.monotonic()
     created_at = start_total
+    REQUEST_COUNTER_BY_PRIO[priority].inc()
+
+    if translation_cache is not None:
+        cached = translation_cache.get(cache_key(req.text))
+        if cached is not None:
+            CACHE_HITS.inc()
+            LATENCY_HISTOGRAM_BY_PRIO[priority].observe(time.monotonic() - start_total)
+            return TranslateResponse(
+                original_text=req.text,
+                translated_text=cached,
+                priority=priority,
+                processing_time=0.0,
+                queued_time=0.0,
+                model_loaded=True,
+            )
+
+    if task_queue.full(priority):
+        raise HTTPException(status_code=429, detail="queue full")
 
     # Future to get result back from worker
     loop = asyncio.get_running_loop()
     future: asyncio.Future = loop.create_future()
 
     # Put job into queue (lower priority number = earlier)
-    await task_queue.put((priority, created_at, req.text, future))
-    print(
-        f"[API] Enqueued job | priority={priority} | "
-        f"text='{req.text[:40]}...' | queue_size={task_queue.qsize()}"
-    )
-
-    REQUEST_COUNTER.labels(priority=priority_label).inc()
+    task_queue.put_nowait(priority, created_at, req.text, future)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            f"[API] Enqueued job | priority={priority} | "
+            f"text='{req.text[:40]}...' | queue_size={task_queue.qsize()}"
+        )
 
     try:
         result = await future  # wait for worker to finish
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-    total_latency = time.time() - start_total
-    LATENCY_HISTOGRAM.labels(priority=priority_label).observe(total_latency)
+    total_latency = time.monotonic() - start_total
+    LATENCY_HISTOGRAM_BY_PRIO[priority].observe(total_latency)
 
     return TranslateResponse(**result)
 
 
 @app.get("/metrics")
-def metrics():
-    """Prometheus metrics endpoint."""
-    data = generate_latest()
-    return PlainTextResponse(data.decode("utf-8"), media_type=CONTENT_TYPE_LATEST)
+async def metrics():
+    """Prometheus metrics endpoint (serialized at most once per METRICS_CACHE_TTL)."""
+    async with _metrics_lock:
+        now = time.monotonic()
+        if now - _metrics_cache["ts"] > METRICS_CACHE_TTL:
+            loop = asyncio.get_running_loop()
+            data = await loop.run_in_executor(None, generate_latest)
+            _metrics_cache["data"] = data.decode("utf-8")
+            _metrics_cache["ts"] = now
+    return PlainTextResponse(_metrics_cache["data"], media_type=CONTENT_TYPE_LATEST)
@@ -3,6 +3,7 @@ Download translation model
 Run this once before starting the server
 """
 
+import ctranslate2
 from transformers import MarianMTModel, MarianTokenizer
 
 print("=" * 60)
@@ -15,19 +16,24 @@ print("This will take 2-3 minutes...\n")
 model_name = 'Helsinki-NLP/opus-mt-en-fr'
 
 try:
-    print("Step 1/2: Downloading tokenizer...")
+    print("Step 1/3: Downloading tokenizer...")
     tokenizer = MarianTokenizer.from_pretrained(model_name)
     print("✓ Tokenizer downloaded")
     
-    print("\nStep 2/2: Downloading model (this is the big one)...")
+    print("\nStep 2/3: Downloading model (this is the big one)...")
     model = MarianMTModel.from_pretrained(model_name)
     print("✓ Model downloaded")
     
     print("\nSaving to local folder...")
     tokenizer.save_pretrained('./models/opus-mt-en-fr')
-    model.save_pretrained('./models/opus-mt-en-fr')
+    model.save_pretrained('./models/opus-mt-en-fr', safe_serialization=True)
     print("✓ Saved to ./models/opus-mt-en-fr")
     
+    print("\nStep 3/3: Converting to CTranslate2 (int8)...")
+    converter = ctranslate2.converters.TransformersConverter('./models/opus-mt-en-fr')
+    converter.convert('./models/opus-mt-en-fr-ct2', quantization='int8', force=True)
+    print("✓ Saved to ./models/opus-mt-en-fr-ct2")
+    
     print("\n" + "=" * 60)
     print("✅ SUCCESS! Model is ready to use")
     print("=" * 60)